@@ -3,11 +3,15 @@
 
 import base64
 import os
+import re
 import subprocess
 import sys
 
+import release_archive
+
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_DIR = os.path.dirname(SCRIPT_DIR)
+VERSION = '1.0.1'
 
 def read_file(path):
     with open(path, 'r', encoding='utf-8') as f:
@@ -26,6 +30,22 @@ def escape_swift_string(s):
     return s
 
 def main():
+    zip_name = f'Northwoods-Wayfind-v{VERSION}.zip'
+
+    # Optional: previous release zip (with its .manifest.json alongside) to build a delta against.
+    # Loaded up front, before this build can overwrite anything.
+    previous_zip = os.path.abspath(sys.argv[1]) if len(sys.argv) > 1 else None
+    previous_manifest = None
+    if previous_zip:
+        if not os.path.exists(release_archive.manifest_path_for(previous_zip)):
+            print(f"ERROR: No manifest found for {previous_zip}")
+            sys.exit(1)
+        previous_manifest = release_archive.load_manifest(release_archive.manifest_path_for(previous_zip))
+        same_file = os.path.realpath(previous_zip) == os.path.realpath(os.path.join(PROJECT_DIR, zip_name))
+        if same_file or previous_manifest['version'] == VERSION:
+            print(f"ERROR: {previous_zip} is v{previous_manifest['version']}; bump VERSION before building a delta")
+            sys.exit(1)
+
     print("Building Wayfind Launcher...")
 
     # Read assets
@@ -55,72 +75,13 @@ def main():
     # Read server.js
     print("  Reading server.js...")
     server_js = read_file(os.path.join(PROJECT_DIR, 'server.js'))
-    # Use the simplified version without dotenv
-    server_js = '''const http = require('http');
-const https = require('https');
-const fs = require('fs');
-const path = require('path');
-
-const PORT = 8080;
-const ESPACE_API_KEY = process.env.ESPACE_API_KEY;
-const ESPACE_DISPLAY_ID = process.env.ESPACE_DISPLAY_ID || '7';
-
-if (!ESPACE_API_KEY) {
-    console.error('ERROR: ESPACE_API_KEY not set');
-    process.exit(1);
-}
-
-const API_URL = `https://app.espace.cool/FacilieSpace/DigitalSignage/GetDisplayEvents/${ESPACE_DISPLAY_ID}?key=${ESPACE_API_KEY}`;
-
-const mimeTypes = {
-    '.html': 'text/html',
-    '.css': 'text/css',
-    '.js': 'application/javascript',
-    '.json': 'application/json',
-    '.png': 'image/png',
-    '.jpg': 'image/jpeg',
-    '.otf': 'font/otf',
-    '.ttf': 'font/ttf'
-};
-
-http.createServer((req, res) => {
-    const parsedUrl = new URL(req.url, `http://localhost:${PORT}`);
-    const pathname = parsedUrl.pathname;
-
-    if (pathname === '/api/events') {
-        https.get(API_URL, (apiRes) => {
-            let data = '';
-            apiRes.on('data', chunk => data += chunk);
-            apiRes.on('end', () => {
-                res.writeHead(200, {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                });
-                res.end(data);
-            });
-        }).on('error', (err) => {
-            res.writeHead(500, { 'Content-Type': 'application/json' });
-            res.end(JSON.stringify({ error: 'Failed to fetch events' }));
-        });
-        return;
-    }
-
-    let filePath = pathname === '/' ? '/index.html' : pathname;
-    filePath = path.join(__dirname, filePath);
-    const ext = path.extname(filePath);
-    const contentType = mimeTypes[ext] || 'application/octet-stream';
-
-    fs.readFile(filePath, (err, content) => {
-        if (err) {
-            res.writeHead(err.code === 'ENOENT' ? 404 : 500);
-            res.end(err.code === 'ENOENT' ? 'Not found' : 'Error');
-        } else {
-            res.writeHead(200, { 'Content-Type': contentType });
-            res.end(content);
-        }
-    });
-}).listen(PORT, () => console.log(`Server running on http://localhost:${PORT}`));
-'''
+    # The launcher loads .env itself, so drop the dotenv dependency
+    server_js, dotenv_count = re.subn(
+        r"^\s*require\(\s*['\"]dotenv['\"]\s*\)\.config\(\s*\);?[ \t]*\r?\n?", '', server_js, flags=re.MULTILINE
+    )
+    if dotenv_count != 1 or 'dotenv' in server_js:
+        print("ERROR: Could not remove the dotenv require from server.js")
+        sys.exit(1)
     server_js_escaped = escape_swift_string(server_js)
 
     # Generate Swift code
@@ -456,6 +417,8 @@ class AppDelegate: NSObject, NSApplicationDelegate {{
                 }}
             }}
         }}
+        // Menu URLs and the port cleanup assume 8080, so ignore any PORT from .env
+        env["PORT"] = "8080"
 
         serverProcess = Process()
         serverProcess?.executableURL = URL(fileURLWithPath: "/bin/bash")
@@ -660,7 +623,7 @@ app.run()
     # Update Info.plist with Sparkle keys and new version
     print("  Updating Info.plist...")
     info_plist = os.path.join(app_contents, 'Info.plist')
-    subprocess.run(['/usr/libexec/PlistBuddy', '-c', 'Set :CFBundleShortVersionString 1.0.1', info_plist], check=True)
+    subprocess.run(['/usr/libexec/PlistBuddy', '-c', f'Set :CFBundleShortVersionString {VERSION}', info_plist], check=True)
     subprocess.run(['/usr/libexec/PlistBuddy', '-c', 'Set :CFBundleVersion 2', info_plist], check=True)
     subprocess.run(['/usr/libexec/PlistBuddy', '-c', 'Set :LSMinimumSystemVersion 11.0', info_plist], check=True)
     # Add Sparkle keys
@@ -696,16 +659,30 @@ app.run()
     print("  Signing app bundle...")
     subprocess.run(['codesign', '--force', '--deep', '--sign', '-', app_path], check=True)
 
-    # Create zip
+    # Create zip (deterministic, with a content manifest)
     print("  Creating zip...")
     os.chdir(PROJECT_DIR)
-    zip_name = 'Northwoods-Wayfind-v1.0.1.zip'
-    if os.path.exists(zip_name):
-        os.remove(zip_name)
-    subprocess.run(['zip', '-r', '-y', zip_name, 'Northwoods Wayfind.app'], check=True)
+    manifest = release_archive.write_archive('Northwoods Wayfind.app', zip_name, VERSION)
+    release_archive.save_manifest(manifest, release_archive.manifest_path_for(zip_name))
+
+    # Create delta package against the previous release
+    delta_name = None
+    if previous_manifest:
+        delta_name = f"Northwoods-Wayfind-v{previous_manifest['version']}-to-v{VERSION}.delta.zip"
+        print(f"  Creating delta from v{previous_manifest['version']}...")
+        try:
+            index = release_archive.write_delta(previous_zip, previous_manifest, zip_name, manifest, delta_name)
+        except ValueError as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+        print(f"  {len(index['changes'])} changed, {len(index['removed'])} removed")
 
     print(f"\\n✓ Build complete: {zip_name}")
     print(f"  Size: {os.path.getsize(zip_name):,} bytes")
+    print(f"  SHA-256: {manifest['archive_sha256']}")
+    print(f"  Manifest SHA-256: {release_archive.manifest_sha256(manifest)} (publish for delta verification)")
+    if delta_name:
+        print(f"  Delta: {delta_name} ({os.path.getsize(delta_name):,} bytes)")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""Deterministic release archives, content manifests and delta packages.
+
+Archives list entries in sorted order with fixed timestamps and normalized
+permissions, so the same app bundle always produces the same zip. Each
+archive is accompanied by a manifest of its contents, and a delta package
+holds only what changed between two releases.
+
+Everything here is plain Python and runs on any platform:
+
+    python3 release_archive.py archive "Northwoods Wayfind.app" out.zip 1.0.2
+    python3 release_archive.py delta old.zip out.zip out.delta.zip
+    python3 release_archive.py apply old.zip out.delta.zip restored/ <out.manifest.json sha256>
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import stat
+import struct
+import sys
+import tempfile
+import zipfile
+
+FORMAT_VERSION = 1
+# Earliest timestamp a zip entry can hold
+FIXED_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+CHUNK_SIZE = 1024 * 1024
+
+DELTA_INDEX = 'delta.json'
+DELTA_FILES_DIR = 'files/'
+DELTA_PATCHES_DIR = 'patches/'
+
+# Binary patch ops: copy a range of the old file, or insert literal bytes
+PATCH_BLOCK_SIZE = 64
+OP_COPY = 0x43
+OP_INSERT = 0x49
+
+
+def manifest_path_for(zip_path):
+    """Manifest location for an archive (alongside it)."""
+    return os.path.splitext(zip_path)[0] + '.manifest.json'
+
+
+def load_manifest(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _manifest_bytes(manifest):
+    return (json.dumps(manifest, indent=2, sort_keys=True) + '\n').encode('utf-8')
+
+
+def save_manifest(manifest, path):
+    with open(path, 'wb') as f:
+        f.write(_manifest_bytes(manifest))
+
+
+def manifest_sha256(manifest):
+    """sha256 of the manifest as save_manifest writes it (the value to publish)."""
+    return hashlib.sha256(_manifest_bytes(manifest)).hexdigest()
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _normalized_mode(st_mode):
+    """Collapse permissions to 755/644 so umask and checkout state don't leak in."""
+    if stat.S_ISDIR(st_mode) or st_mode & 0o111:
+        return 0o755
+    return 0o644
+
+
+def _zip_info(name, kind, mode=0o644):
+    """ZipInfo with fixed metadata for a file, dir or link entry."""
+    info = zipfile.ZipInfo(name, date_time=FIXED_DATE_TIME)
+    info.create_system = 3  # Unix, so external_attr carries permissions
+    if kind == 'dir':
+        info.external_attr = ((stat.S_IFDIR | 0o755) << 16) | 0x10
+        info.compress_type = zipfile.ZIP_STORED
+    elif kind == 'link':
+        info.external_attr = (stat.S_IFLNK | 0o777) << 16
+        info.compress_type = zipfile.ZIP_STORED
+    else:
+        info.external_attr = (stat.S_IFREG | mode) << 16
+        info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def _entry_kind(info):
+    file_type = stat.S_IFMT(info.external_attr >> 16)
+    if info.is_dir():
+        return 'dir'
+    if file_type == stat.S_IFLNK:
+        return 'link'
+    return 'file'
+
+
+def _write_stream(zf, info, src, size):
+    """Stream src into the archive, returning its sha256."""
+    digest = hashlib.sha256()
+    info.file_size = size  # Lets zipfile decide on zip64 up front
+    with zf.open(info, 'w') as dst:
+        for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+            dst.write(chunk)
+    return digest.hexdigest()
+
+
+def _collect_entries(src_dir):
+    """(archive name, path) pairs for everything under src_dir, in archive order."""
+    base = os.path.dirname(os.path.abspath(src_dir))
+    entries = []
+    for root, dirs, files in os.walk(src_dir):
+        names = dirs + files
+        # Links to directories are archived as links, not descended into
+        dirs[:] = [d for d in dirs if not os.path.islink(os.path.join(root, d))]
+        for name in names:
+            path = os.path.join(root, name)
+            entries.append((os.path.relpath(path, base).replace(os.sep, '/'), path))
+    entries.append((os.path.basename(os.path.abspath(src_dir)), src_dir))
+    return sorted(entries)
+
+
+def write_archive(src_dir, zip_path, version):
+    """Archive src_dir (kept as the top-level folder) and return its manifest.
+
+    Entries are sorted and carry fixed timestamps and normalized permissions,
+    so identical input always produces a byte-identical zip.
+    """
+    files = {}
+    with zipfile.ZipFile(zip_path, 'w') as zf:
+        for name, path in _collect_entries(src_dir):
+            st = os.lstat(path)
+            if stat.S_ISLNK(st.st_mode):
+                target = os.readlink(path)
+                zf.writestr(_zip_info(name, 'link'), target)
+                files[name] = {'type': 'link', 'target': target}
+            elif stat.S_ISDIR(st.st_mode):
+                zf.writestr(_zip_info(name + '/', 'dir'), b'')
+                files[name] = {'type': 'dir'}
+            else:
+                mode = _normalized_mode(st.st_mode)
+                with open(path, 'rb') as src:
+                    digest = _write_stream(zf, _zip_info(name, 'file', mode), src, st.st_size)
+                files[name] = {
+                    'type': 'file',
+                    'mode': format(mode, 'o'),
+                    'size': st.st_size,
+                    'sha256': digest,
+                }
+
+    return {
+        'format': FORMAT_VERSION,
+        'version': version,
+        'archive_sha256': sha256_file(zip_path),
+        'files': files,
+    }
+
+
+def make_patch(old, new):
+    """Encode new as copy/insert ops against old.
+
+    Old is indexed in fixed blocks; new is scanned byte by byte for a block
+    match, which is then extended in both directions. Shifted content (e.g.
+    a longer embedded index.html) still matches.
+    """
+    index = {}
+    for offset in range(0, len(old) - PATCH_BLOCK_SIZE + 1, PATCH_BLOCK_SIZE):
+        index.setdefault(old[offset:offset + PATCH_BLOCK_SIZE], offset)
+
+    ops = []
+    literal_start = 0
+    i = 0
+    while i + PATCH_BLOCK_SIZE <= len(new):
+        offset = index.get(new[i:i + PATCH_BLOCK_SIZE])
+        if offset is None:
+            i += 1
+            continue
+
+        start = i
+        while start > literal_start and offset > 0 and old[offset - 1] == new[start - 1]:
+            start -= 1
+            offset -= 1
+
+        end = i + PATCH_BLOCK_SIZE
+        old_end = offset + (end - start)
+        while end + PATCH_BLOCK_SIZE <= len(new) \
+                and new[end:end + PATCH_BLOCK_SIZE] == old[old_end:old_end + PATCH_BLOCK_SIZE]:
+            end += PATCH_BLOCK_SIZE
+            old_end += PATCH_BLOCK_SIZE
+        while end < len(new) and old_end < len(old) and new[end] == old[old_end]:
+            end += 1
+            old_end += 1
+
+        if start > literal_start:
+            ops.append(struct.pack('>BQ', OP_INSERT, start - literal_start))
+            ops.append(new[literal_start:start])
+        ops.append(struct.pack('>BQQ', OP_COPY, offset, end - start))
+        literal_start = i = end
+
+    if literal_start < len(new):
+        ops.append(struct.pack('>BQ', OP_INSERT, len(new) - literal_start))
+        ops.append(new[literal_start:])
+    return b''.join(ops)
+
+
+def apply_patch(old, patch):
+    """Rebuild the new file from old and a patch made by make_patch."""
+    out = bytearray()
+    pos = 0
+    while pos < len(patch):
+        op = patch[pos]
+        pos += 1
+        if op == OP_COPY:
+            offset, length = struct.unpack_from('>QQ', patch, pos)
+            pos += 16
+            out += old[offset:offset + length]
+        elif op == OP_INSERT:
+            (length,) = struct.unpack_from('>Q', patch, pos)
+            pos += 8
+            out += patch[pos:pos + length]
+            pos += length
+        else:
+            raise ValueError(f'Corrupt patch: unknown op {op:#x} at byte {pos - 1}')
+    return bytes(out)
+
+
+def write_delta(base_zip, base_manifest, target_zip, target_manifest, delta_path):
+    """Write a delta package turning the base release into the target release.
+
+    Added files are stored whole; changed files as a binary patch against
+    the base copy when that is smaller. Unchanged files are not included.
+    Returns the delta index.
+    """
+    if sha256_file(base_zip) != base_manifest['archive_sha256']:
+        raise ValueError(f'{base_zip} does not match its manifest')
+
+    base_files = base_manifest['files']
+    target_files = target_manifest['files']
+    changes = {}
+
+    with zipfile.ZipFile(base_zip) as base, zipfile.ZipFile(target_zip) as target, \
+            zipfile.ZipFile(delta_path, 'w') as delta:
+        payloads = []
+        for name in sorted(target_files):
+            entry = target_files[name]
+            if entry['type'] != 'file' or base_files.get(name) == entry:
+                continue
+
+            old_entry = base_files.get(name)
+            if old_entry and old_entry.get('sha256') == entry['sha256']:
+                # Only the mode changed
+                changes[name] = {'op': 'chmod'}
+                continue
+
+            new_data = target.read(name)
+
+            if old_entry and old_entry['type'] == 'file':
+                patch = make_patch(base.read(name), new_data)
+                if len(patch) < len(new_data):
+                    changes[name] = {'op': 'patch', 'size': len(patch)}
+                    payloads.append((DELTA_PATCHES_DIR + name, patch))
+                    continue
+
+            changes[name] = {'op': 'add', 'size': len(new_data)}
+            payloads.append((DELTA_FILES_DIR + name, new_data))
+
+        index = {
+            'format': FORMAT_VERSION,
+            'base': {
+                'version': base_manifest['version'],
+                'archive_sha256': base_manifest['archive_sha256'],
+            },
+            'removed': sorted(name for name in base_files if name not in target_files),
+            'changes': changes,
+            'manifest': target_manifest,
+        }
+        index_data = json.dumps(index, indent=2, sort_keys=True).encode('utf-8')
+        delta.writestr(_zip_info(DELTA_INDEX, 'file'), index_data)
+        for name, data in payloads:
+            delta.writestr(_zip_info(name, 'file'), data)
+
+    return index
+
+
+def _check_name(name):
+    """Reject archive names that could land outside the destination."""
+    parts = name.split('/')
+    if not name or name.startswith('/') or '\\' in name or ':' in parts[0] \
+            or any(part in ('', '.', '..') for part in parts):
+        raise ValueError(f'Unsafe path in archive: {name!r}')
+    return parts
+
+
+def _check_link(name, target):
+    """Reject links that are absolute or point outside the tree."""
+    resolved = os.path.normpath(os.path.join(os.path.dirname(name), target))
+    if os.path.isabs(target) or resolved == '..' or resolved.startswith('..' + os.sep):
+        raise ValueError(f'Unsafe link in archive: {name!r} -> {target!r}')
+
+
+def _safe_path(dest_dir, name):
+    """Path for an archive name under dest_dir, refusing to follow links on the way."""
+    path = dest_dir
+    for part in _check_name(name)[:-1]:
+        path = os.path.join(path, part)
+        if os.path.islink(path):
+            raise ValueError(f'Unsafe path in archive: {name!r} passes through a link')
+    return os.path.join(path, name.split('/')[-1])
+
+
+def _require_empty(dest_dir):
+    if os.path.exists(dest_dir) and (not os.path.isdir(dest_dir) or os.listdir(dest_dir)):
+        raise ValueError(f'{dest_dir} must be missing or empty')
+
+
+def extract_archive(zip_path, dest_dir):
+    """Extract an archive into a missing or empty dest_dir.
+
+    Unlike extractall, links and permissions are restored. Entries that are
+    absolute, contain '..', pass through a link or link outside the tree
+    are rejected.
+    """
+    _require_empty(dest_dir)
+    os.makedirs(dest_dir, exist_ok=True)
+    with zipfile.ZipFile(zip_path) as zf:
+        for info in zf.infolist():
+            name = info.filename.rstrip('/')
+            path = _safe_path(dest_dir, name)
+            kind = _entry_kind(info)
+            if kind == 'dir':
+                os.makedirs(path, exist_ok=True)
+                continue
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.lexists(path):
+                raise ValueError(f'Duplicate entry in archive: {name!r}')
+            if kind == 'link':
+                target = zf.read(info).decode('utf-8')
+                _check_link(name, target)
+                os.symlink(target, path)
+            else:
+                with zf.open(info) as src, open(path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+                os.chmod(path, stat.S_IMODE(info.external_attr >> 16))
+
+
+def _remove_path(path):
+    if os.path.islink(path) or not os.path.isdir(path):
+        os.remove(path)
+    else:
+        shutil.rmtree(path)
+
+
+def _tree_names(root):
+    """Archive-style names of everything under root."""
+    names = set()
+    for dirpath, dirs, files in os.walk(root):
+        for name in dirs + files:
+            names.add(os.path.relpath(os.path.join(dirpath, name), root).replace(os.sep, '/'))
+    return names
+
+
+def _rebuild_tree(base_zip, delta, index, work_dir):
+    """Apply a delta's changes on top of the extracted base archive in work_dir."""
+    extract_archive(base_zip, work_dir)
+    files = index['manifest']['files']
+
+    for name in sorted(index['removed'], reverse=True):
+        path = _safe_path(work_dir, name)
+        if os.path.lexists(path):
+            _remove_path(path)
+
+    for name in sorted(files):
+        entry = files[name]
+        path = _safe_path(work_dir, name)
+        change = index['changes'].get(name)
+
+        if entry['type'] == 'dir':
+            if os.path.lexists(path) and not os.path.isdir(path):
+                _remove_path(path)
+            os.makedirs(path, exist_ok=True)
+        elif entry['type'] == 'link':
+            _check_link(name, entry['target'])
+            if os.path.lexists(path):
+                if os.path.islink(path) and os.readlink(path) == entry['target']:
+                    continue
+                _remove_path(path)
+            os.symlink(entry['target'], path)
+        elif change and change['op'] in ('add', 'patch'):
+            if change['op'] == 'add':
+                data = delta.read(DELTA_FILES_DIR + name)
+            else:
+                with open(path, 'rb') as f:
+                    data = apply_patch(f.read(), delta.read(DELTA_PATCHES_DIR + name))
+            if os.path.lexists(path):
+                _remove_path(path)
+            with open(path, 'wb') as f:
+                f.write(data)
+
+        if entry['type'] == 'file':
+            os.chmod(path, int(entry['mode'], 8))
+            if sha256_file(path) != entry['sha256']:
+                raise ValueError(f'{name} does not match the target manifest')
+
+    stray = _tree_names(work_dir) - set(files)
+    if stray:
+        raise ValueError(f'Unexpected entries after applying delta: {sorted(stray)}')
+
+
+def apply_delta(base_zip, delta_path, dest_dir, expected_manifest_sha256, expected_archive_sha256=None):
+    """Rebuild the target release tree in dest_dir from the base archive and a delta.
+
+    dest_dir must be missing or empty. expected_manifest_sha256 is the
+    target manifest's hash (manifest_sha256, i.e. of the published
+    .manifest.json) from a trusted source such as the appcast, not the
+    delta. Once the delta's manifest matches it, every rebuilt entry is
+    checked against that manifest. expected_archive_sha256 optionally also
+    requires the re-archived tree to reproduce the target zip exactly; that
+    only holds when zipfile/zlib match the build machine's. The tree is
+    built in a temporary directory and only moved into dest_dir once
+    verified. Returns the target manifest.
+    """
+    _require_empty(dest_dir)
+    parent = os.path.dirname(os.path.abspath(dest_dir))
+    os.makedirs(parent, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix='.wayfind-delta-', dir=parent)
+
+    try:
+        with zipfile.ZipFile(delta_path) as delta:
+            index = json.loads(delta.read(DELTA_INDEX))
+            manifest = index['manifest']
+            if manifest_sha256(manifest) != expected_manifest_sha256:
+                raise ValueError(f'{delta_path} does not carry the expected target manifest')
+            if sha256_file(base_zip) != index['base']['archive_sha256']:
+                raise ValueError(f'{base_zip} is not the base release of {delta_path}')
+            _rebuild_tree(base_zip, delta, index, work_dir)
+
+        if expected_archive_sha256:
+            tops = os.listdir(work_dir)
+            if len(tops) != 1:
+                raise ValueError(f'Expected one top-level folder, found {sorted(tops)}')
+
+            check_zip = work_dir + '.zip'
+            try:
+                rebuilt = write_archive(os.path.join(work_dir, tops[0]), check_zip, manifest['version'])
+            finally:
+                if os.path.exists(check_zip):
+                    os.remove(check_zip)
+            if rebuilt['archive_sha256'] != expected_archive_sha256:
+                raise ValueError(f'Rebuilt archive does not match the expected sha256 {expected_archive_sha256}')
+
+        if os.path.isdir(dest_dir):
+            os.rmdir(dest_dir)
+        os.rename(work_dir, dest_dir)
+    except BaseException:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    archive_cmd = commands.add_parser('archive', help='Archive a folder and write its manifest')
+    archive_cmd.add_argument('src_dir')
+    archive_cmd.add_argument('zip_path')
+    archive_cmd.add_argument('version')
+
+    delta_cmd = commands.add_parser('delta', help='Write a delta package between two archives')
+    delta_cmd.add_argument('base_zip')
+    delta_cmd.add_argument('target_zip')
+    delta_cmd.add_argument('delta_path')
+
+    apply_cmd = commands.add_parser('apply', help='Rebuild a release from a base archive and delta')
+    apply_cmd.add_argument('base_zip')
+    apply_cmd.add_argument('delta_path')
+    apply_cmd.add_argument('dest_dir')
+    apply_cmd.add_argument('expected_manifest_sha256',
+                           help='sha256 of the target .manifest.json, from a trusted source')
+    apply_cmd.add_argument('--archive-sha256',
+                           help='Also require the rebuilt tree to re-archive to this zip sha256')
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'archive':
+            manifest = write_archive(args.src_dir, args.zip_path, args.version)
+            save_manifest(manifest, manifest_path_for(args.zip_path))
+            print(f"{args.zip_path}: {len(manifest['files'])} entries, sha256 {manifest['archive_sha256']}")
+            print(f"Manifest sha256 {manifest_sha256(manifest)}")
+        elif args.command == 'delta':
+            index = write_delta(
+                args.base_zip, load_manifest(manifest_path_for(args.base_zip)),
+                args.target_zip, load_manifest(manifest_path_for(args.target_zip)),
+                args.delta_path
+            )
+            print(f"{args.delta_path}: {len(index['changes'])} changed, {len(index['removed'])} removed")
+        else:
+            manifest = apply_delta(
+                args.base_zip, args.delta_path, args.dest_dir,
+                args.expected_manifest_sha256, args.archive_sha256
+            )
+            print(f"{args.dest_dir}: verified {manifest['version']} ({len(manifest['files'])} entries)")
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+        print(f'ERROR: {e}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""Tests for release_archive (run with: python3 -m pytest WayfindLauncher)."""
+
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import unittest
+import zipfile
+
+import release_archive
+
+APP = 'Northwoods Wayfind.app'
+
+
+class ReleaseArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def path(self, *parts):
+        return os.path.join(self.tmp, *parts)
+
+    def make_app(self, root, binary=b'binary v1', extra=None):
+        """A small app bundle with a framework symlink layout like Sparkle's."""
+        contents = self.path(root, APP, 'Contents')
+        framework = os.path.join(contents, 'Frameworks', 'Sparkle.framework')
+        versions = os.path.join(framework, 'Versions')
+        os.makedirs(os.path.join(versions, 'B'))
+        os.makedirs(os.path.join(contents, 'MacOS'))
+        os.symlink('B', os.path.join(versions, 'Current'))
+        os.symlink('Versions/Current/Sparkle', os.path.join(framework, 'Sparkle'))
+        with open(os.path.join(versions, 'B', 'Sparkle'), 'wb') as f:
+            f.write(b'sparkle' * 100)
+        executable = os.path.join(contents, 'MacOS', 'WayfindLauncher')
+        with open(executable, 'wb') as f:
+            f.write(binary)
+        os.chmod(executable, 0o755)
+        with open(os.path.join(contents, 'Info.plist'), 'w') as f:
+            f.write('plist')
+        for name, data in (extra or {}).items():
+            path = os.path.join(contents, *name.split('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(data)
+        return self.path(root, APP)
+
+    def release(self, app, name, version):
+        zip_path = self.path(name)
+        return zip_path, release_archive.write_archive(app, zip_path, version)
+
+    def round_trip(self, base_app, target_app):
+        base_zip, base_manifest = self.release(base_app, 'base.zip', '1.0.0')
+        target_zip, target_manifest = self.release(target_app, 'target.zip', '1.0.1')
+        delta_zip = self.path('delta.zip')
+        index = release_archive.write_delta(
+            base_zip, base_manifest, target_zip, target_manifest, delta_zip)
+        manifest = release_archive.apply_delta(
+            base_zip, delta_zip, self.path('out'),
+            release_archive.manifest_sha256(target_manifest), target_manifest['archive_sha256'])
+        self.assertEqual(manifest['files'], target_manifest['files'])
+        return index
+
+    def test_archive_is_reproducible(self):
+        app = self.make_app('a')
+        _, first = self.release(app, 'first.zip', '1.0.0')
+        time.sleep(1.1)
+        os.utime(os.path.join(app, 'Contents', 'Info.plist'))
+        os.chmod(os.path.join(app, 'Contents', 'Info.plist'), 0o600)
+        _, second = self.release(app, 'second.zip', '1.0.0')
+        self.assertEqual(first, second)
+        with open(self.path('first.zip'), 'rb') as a, open(self.path('second.zip'), 'rb') as b:
+            self.assertEqual(a.read(), b.read())
+
+    def test_patch_round_trip(self):
+        rng = random.Random(1)
+        blob = bytes(rng.getrandbits(8) for _ in range(20000))
+        cases = [
+            (b'', b''),
+            (b'', b'new'),
+            (b'old', b''),
+            (b'short', b'shorter'),
+            (blob, blob),
+            (blob, blob[:7000] + b'inserted html' * 50 + blob[7000:]),
+            (blob, blob[:5000] + blob[9000:]),
+            (blob, bytes(rng.getrandbits(8) for _ in range(3000))),
+        ]
+        for old, new in cases:
+            patch = release_archive.make_patch(old, new)
+            self.assertEqual(release_archive.apply_patch(old, patch), new)
+
+        shifted = blob[:7000] + b'x' * 100 + blob[7000:]
+        self.assertLess(len(release_archive.make_patch(blob, shifted)), 300)
+
+    def test_corrupt_patch_is_rejected(self):
+        with self.assertRaises(ValueError):
+            release_archive.apply_patch(b'old', b'\x00')
+
+    def test_delta_round_trip(self):
+        rng = random.Random(2)
+        blob = bytes(rng.getrandbits(8) for _ in range(20000))
+        index = self.round_trip(
+            self.make_app('a', binary=blob, extra={'old.txt': 'old'}),
+            self.make_app('b', binary=blob[:100] + b'longer' + blob[100:], extra={'new.txt': 'new'}),
+        )
+        binary = f'{APP}/Contents/MacOS/WayfindLauncher'
+        self.assertEqual(index['changes'][binary]['op'], 'patch')
+        self.assertEqual(index['changes'][f'{APP}/Contents/new.txt']['op'], 'add')
+        self.assertEqual(index['removed'], [f'{APP}/Contents/old.txt'])
+        self.assertNotIn(f'{APP}/Contents/Info.plist', index['changes'])
+
+    def test_mode_only_change(self):
+        base = self.make_app('a')
+        target = self.make_app('b')
+        os.chmod(os.path.join(target, 'Contents', 'Info.plist'), 0o755)
+        index = self.round_trip(base, target)
+        self.assertEqual(index['changes'], {f'{APP}/Contents/Info.plist': {'op': 'chmod'}})
+
+    def test_removed_directory(self):
+        index = self.round_trip(
+            self.make_app('a', extra={'Resources/One.txt': '1', 'Resources/Two.txt': '2'}),
+            self.make_app('b'),
+        )
+        self.assertIn(f'{APP}/Contents/Resources', index['removed'])
+        self.assertFalse(os.path.exists(self.path('out', APP, 'Contents', 'Resources')))
+
+    def test_file_becomes_link_and_back(self):
+        plain = self.make_app('a', extra={'Resources/Info.txt': 'text'})
+        linked = self.make_app('b', extra={'Resources/Real.txt': 'text'})
+        os.symlink('Real.txt', os.path.join(linked, 'Contents', 'Resources', 'Info.txt'))
+        plain_again = self.make_app('c', extra={'Resources/Info.txt': 'text', 'Resources/Real.txt': 'text'})
+
+        self.round_trip(plain, linked)
+        self.assertTrue(os.path.islink(self.path('out', APP, 'Contents', 'Resources', 'Info.txt')))
+
+        for name in ('out', 'base.zip', 'target.zip', 'delta.zip'):
+            path = self.path(name)
+            shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+        self.round_trip(linked, plain_again)
+        self.assertFalse(os.path.islink(self.path('out', APP, 'Contents', 'Resources', 'Info.txt')))
+
+    def test_mismatched_base_is_rejected(self):
+        base_zip, base_manifest = self.release(self.make_app('a'), 'base.zip', '1.0.0')
+        target_zip, target_manifest = self.release(self.make_app('b', binary=b'v2'), 'target.zip', '1.0.1')
+        delta_zip = self.path('delta.zip')
+        release_archive.write_delta(base_zip, base_manifest, target_zip, target_manifest, delta_zip)
+
+        other_zip, _ = self.release(self.make_app('c', binary=b'other'), 'other.zip', '1.0.0')
+        with self.assertRaises(ValueError):
+            release_archive.apply_delta(other_zip, delta_zip, self.path('out'), release_archive.manifest_sha256(target_manifest))
+        with self.assertRaises(ValueError):
+            release_archive.write_delta(other_zip, base_manifest, target_zip, target_manifest, self.path('d2.zip'))
+        self.assertFalse(os.path.exists(self.path('out')))
+
+    def test_tampered_delta_is_rejected(self):
+        base_zip, base_manifest = self.release(self.make_app('a'), 'base.zip', '1.0.0')
+        target_zip, target_manifest = self.release(self.make_app('b', binary=b'v2'), 'target.zip', '1.0.1')
+        delta_zip = self.path('delta.zip')
+        release_archive.write_delta(base_zip, base_manifest, target_zip, target_manifest, delta_zip)
+
+        # A delta for a different target carries self-consistent hashes; only
+        # the trusted manifest hash catches it
+        evil_zip, evil_manifest = self.release(self.make_app('c', binary=b'evil'), 'evil.zip', '1.0.1')
+        evil_delta = self.path('evil-delta.zip')
+        release_archive.write_delta(base_zip, base_manifest, evil_zip, evil_manifest, evil_delta)
+        with self.assertRaises(ValueError):
+            release_archive.apply_delta(base_zip, evil_delta, self.path('out'), release_archive.manifest_sha256(target_manifest))
+        self.assertFalse(os.path.exists(self.path('out')))
+
+    def test_archive_hash_check_is_optional(self):
+        base_zip, base_manifest = self.release(self.make_app('a'), 'base.zip', '1.0.0')
+        target_zip, target_manifest = self.release(self.make_app('b', binary=b'v2'), 'target.zip', '1.0.1')
+        delta_zip = self.path('delta.zip')
+        release_archive.write_delta(base_zip, base_manifest, target_zip, target_manifest, delta_zip)
+        expected = release_archive.manifest_sha256(target_manifest)
+
+        # A client whose zlib deflates differently still accepts a good delta
+        release_archive.apply_delta(base_zip, delta_zip, self.path('out'), expected)
+        with self.assertRaisesRegex(ValueError, 'Rebuilt archive'):
+            release_archive.apply_delta(base_zip, delta_zip, self.path('out2'), expected, '0' * 64)
+        self.assertFalse(os.path.exists(self.path('out2')))
+
+    def test_manifest_hash_matches_saved_file(self):
+        _, manifest = self.release(self.make_app('a'), 'base.zip', '1.0.0')
+        release_archive.save_manifest(manifest, self.path('base.manifest.json'))
+        self.assertEqual(release_archive.manifest_sha256(manifest),
+                         release_archive.sha256_file(self.path('base.manifest.json')))
+
+    def write_raw_delta(self, base_zip, base_manifest, manifest, removed=(), changes=None, payloads=()):
+        delta_zip = self.path('raw-delta.zip')
+        index = {
+            'format': 1,
+            'base': {'version': '1.0.0', 'archive_sha256': base_manifest['archive_sha256']},
+            'removed': list(removed),
+            'changes': changes or {},
+            'manifest': manifest,
+        }
+        with zipfile.ZipFile(delta_zip, 'w') as zf:
+            zf.writestr(release_archive.DELTA_INDEX, json.dumps(index))
+            for name, data in payloads:
+                zf.writestr(name, data)
+        return delta_zip
+
+    def test_unsafe_delta_paths_are_rejected(self):
+        base_zip, base_manifest = self.release(self.make_app('a'), 'base.zip', '1.0.0')
+        dest = self.path('work', 'out')
+        escaped = '../../escaped.txt'
+
+        files = dict(base_manifest['files'])
+        files[escaped] = {'type': 'file', 'mode': '644', 'size': 1, 'sha256': ''}
+        crafted = dict(base_manifest, files=files)
+        delta_zip = self.write_raw_delta(
+            base_zip, base_manifest, crafted,
+            changes={escaped: {'op': 'add'}},
+            payloads=[(release_archive.DELTA_FILES_DIR + escaped, b'x')],
+        )
+        with self.assertRaisesRegex(ValueError, 'Unsafe'):
+            release_archive.apply_delta(base_zip, delta_zip, dest, release_archive.manifest_sha256(crafted))
+
+        # A link to an outside directory, then a file written through it
+        outside = self.path('outside')
+        os.makedirs(outside)
+        files = dict(base_manifest['files'])
+        files[f'{APP}/Contents/Escape'] = {'type': 'link', 'target': outside}
+        files[f'{APP}/Contents/Escape/pwned.txt'] = {'type': 'file', 'mode': '644', 'size': 1, 'sha256': ''}
+        crafted = dict(base_manifest, files=files)
+        delta_zip = self.write_raw_delta(
+            base_zip, base_manifest, crafted,
+            changes={f'{APP}/Contents/Escape/pwned.txt': {'op': 'add'}},
+            payloads=[(release_archive.DELTA_FILES_DIR + f'{APP}/Contents/Escape/pwned.txt', b'x')],
+        )
+        with self.assertRaisesRegex(ValueError, 'Unsafe'):
+            release_archive.apply_delta(base_zip, delta_zip, dest, release_archive.manifest_sha256(crafted))
+
+        self.assertEqual(os.listdir(outside), [])
+        self.assertFalse(os.path.exists(self.path('escaped.txt')))
+        self.assertFalse(os.path.exists(dest))
+
+    def test_unsafe_archive_entries_are_rejected(self):
+        for name in ('../escaped.txt', '/abs.txt', f'{APP}/../../escaped.txt'):
+            zip_path = self.path('bad.zip')
+            with zipfile.ZipFile(zip_path, 'w') as zf:
+                zf.writestr(name, b'x')
+            with self.assertRaisesRegex(ValueError, 'Unsafe'):
+                release_archive.extract_archive(zip_path, self.path('out'))
+            shutil.rmtree(self.path('out'), ignore_errors=True)
+
+        zip_path = self.path('link.zip')
+        with zipfile.ZipFile(zip_path, 'w') as zf:
+            zf.writestr(release_archive._zip_info(f'{APP}/Escape', 'link'), self.tmp)
+            zf.writestr(f'{APP}/Escape/pwned.txt', b'x')
+        with self.assertRaisesRegex(ValueError, 'Unsafe'):
+            release_archive.extract_archive(zip_path, self.path('out'))
+        self.assertFalse(os.path.exists(self.path('pwned.txt')))
+
+    def test_non_empty_destination_is_rejected(self):
+        base_zip, base_manifest = self.release(self.make_app('a'), 'base.zip', '1.0.0')
+        target_zip, target_manifest = self.release(self.make_app('b', binary=b'v2'), 'target.zip', '1.0.1')
+        delta_zip = self.path('delta.zip')
+        release_archive.write_delta(base_zip, base_manifest, target_zip, target_manifest, delta_zip)
+
+        dest = self.path('out')
+        release_archive.apply_delta(base_zip, delta_zip, dest, release_archive.manifest_sha256(target_manifest))
+        with self.assertRaisesRegex(ValueError, 'missing or empty'):
+            release_archive.apply_delta(base_zip, delta_zip, dest, release_archive.manifest_sha256(target_manifest))
+        with self.assertRaises(ValueError):
+            release_archive.extract_archive(base_zip, dest)
+
+        # An empty destination is fine
+        empty = self.path('empty')
+        os.makedirs(empty)
+        release_archive.apply_delta(base_zip, delta_zip, empty, release_archive.manifest_sha256(target_manifest))
+
+
+if __name__ == '__main__':
+    unittest.main()
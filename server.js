@@ -17,6 +17,48 @@ if (!ESPACE_API_KEY) {
 
 const API_URL = `https://app.espace.cool/FacilieSpace/DigitalSignage/GetDisplayEvents/${ESPACE_DISPLAY_ID}?key=${ESPACE_API_KEY}`;
 
+// Bounds for POLL_MIN_SECONDS / POLL_MAX_SECONDS (setTimeout overflows past ~24.8 days)
+const POLL_DEFAULT_MIN_SECONDS = 60;
+const POLL_DEFAULT_MAX_SECONDS = 1800;
+const POLL_FLOOR_SECONDS = 10;
+const POLL_CEILING_SECONDS = 24 * 60 * 60;
+
+// Read a polling interval from the environment, falling back to the default if unusable
+function readPollSeconds(name, fallback) {
+    const raw = process.env[name];
+    if (raw === undefined || raw.trim() === '') return fallback;
+
+    const seconds = Number(raw);
+    if (!Number.isFinite(seconds) || seconds < POLL_FLOOR_SECONDS || seconds > POLL_CEILING_SECONDS) {
+        console.error(`ERROR: ${name} must be between ${POLL_FLOOR_SECONDS} and ${POLL_CEILING_SECONDS} seconds (got "${raw}"), using ${fallback}`);
+        return fallback;
+    }
+    return seconds;
+}
+
+let pollMinSeconds = readPollSeconds('POLL_MIN_SECONDS', POLL_DEFAULT_MIN_SECONDS);
+let pollMaxSeconds = readPollSeconds('POLL_MAX_SECONDS', POLL_DEFAULT_MAX_SECONDS);
+if (pollMinSeconds > pollMaxSeconds) {
+    console.error(`ERROR: POLL_MIN_SECONDS (${pollMinSeconds}) is above POLL_MAX_SECONDS (${pollMaxSeconds}), using ${POLL_DEFAULT_MIN_SECONDS} and ${POLL_DEFAULT_MAX_SECONDS}`);
+    pollMinSeconds = POLL_DEFAULT_MIN_SECONDS;
+    pollMaxSeconds = POLL_DEFAULT_MAX_SECONDS;
+}
+
+// Upstream polling schedule - eSpace is polled here and displays are served
+// the latest snapshot, so poll frequency no longer depends on display count
+const POLL = {
+    minInterval: pollMinSeconds * 1000,
+    maxInterval: pollMaxSeconds * 1000,
+    activeInterval: 5 * 60 * 1000,  // Base interval while displays are connected
+    boundaryLead: 15 * 60 * 1000,   // Poll at the minimum interval from 15 min before an event starts or ends...
+    boundaryTrail: 5 * 60 * 1000,   // ...until 5 min after
+    activeWindow: 5 * 60 * 1000,    // A display counts as connected if it requested events this recently
+    requestTimeout: 30 * 1000,      // Give up on an eSpace request after 30s of inactivity
+    maxBackoffSteps: 4,             // Unchanged polls double the interval up to 2^4 times (capped at maxInterval)
+    quietStartHour: 22,             // Overnight, poll at the maximum interval unless an event is near
+    quietEndHour: 6
+};
+
 // MIME types for static files
 const mimeTypes = {
     '.html': 'text/html',
@@ -27,9 +69,171 @@ const mimeTypes = {
     '.jpg': 'image/jpeg',
     '.gif': 'image/gif',
     '.svg': 'image/svg+xml',
-    '.ico': 'image/x-icon'
+    '.ico': 'image/x-icon',
+    '.otf': 'font/otf',
+    '.ttf': 'font/ttf'
 };
 
+// Upstream state
+let snapshot = null;          // { body, boundaries, fetchedAt, unchangedPolls }
+let inFlight = null;
+let pollTimer = null;
+let lastPollAt = 0;
+let failedPolls = 0;
+let lastDisplayActivity = 0;
+
+// Parse .NET date format - API sends local time encoded as UTC timestamp (same as index.html)
+function parseNetDate(dateString) {
+    const match = /\/Date\((\d+)([+-]\d{4})?\)\//.exec(dateString || '');
+    if (!match) return null;
+    const utcDate = new Date(parseInt(match[1], 10));
+    return new Date(
+        utcDate.getUTCFullYear(),
+        utcDate.getUTCMonth(),
+        utcDate.getUTCDate(),
+        utcDate.getUTCHours(),
+        utcDate.getUTCMinutes(),
+        utcDate.getUTCSeconds()
+    ).getTime();
+}
+
+// Times at which displayed events start or end
+function getEventBoundaries(events) {
+    const boundaries = [];
+    events
+        .filter(e => !e.IsHiddenFromDisplay)
+        .forEach((e) => {
+            [parseNetDate(e.EventStart), parseNetDate(e.EventEnd)].forEach((time) => {
+                if (time !== null) boundaries.push(time);
+            });
+        });
+    return boundaries;
+}
+
+function isDisplayActive(now) {
+    return now - lastDisplayActivity <= POLL.activeWindow;
+}
+
+function clampInterval(delay) {
+    return Math.min(POLL.maxInterval, Math.max(POLL.minInterval, delay));
+}
+
+// Pick the delay until the next upstream poll from the current snapshot and activity
+function nextPollDelay(now) {
+    if (failedPolls > 0) {
+        return {
+            delay: clampInterval(POLL.minInterval * 2 ** Math.min(failedPolls - 1, POLL.maxBackoffSteps)),
+            reason: 'retrying after error'
+        };
+    }
+
+    const boundaries = snapshot ? snapshot.boundaries : [];
+
+    // An event is about to start or end (or just did) - this is when changes matter
+    if (boundaries.some(t => now >= t - POLL.boundaryLead && now <= t + POLL.boundaryTrail)) {
+        return { delay: POLL.minInterval, reason: 'event starting or ending' };
+    }
+
+    const hour = new Date(now).getHours();
+    const quiet = hour >= POLL.quietStartHour || hour < POLL.quietEndHour;
+    let delay = POLL.maxInterval;
+    let reason = quiet ? 'overnight' : 'no displays connected';
+
+    if (!quiet && isDisplayActive(now)) {
+        delay = POLL.activeInterval;
+        reason = 'displays connected';
+        // Back off while nothing changes
+        if (snapshot && snapshot.unchangedPolls > 0) {
+            delay *= 2 ** Math.min(snapshot.unchangedPolls, POLL.maxBackoffSteps);
+            reason += ', unchanged';
+        }
+    }
+
+    // Wake up in time for the next event boundary
+    const nextLead = Math.min(...boundaries.map(t => t - POLL.boundaryLead).filter(t => t > now));
+    if (nextLead - now < delay) {
+        delay = nextLead - now;
+        reason = 'next event boundary';
+    }
+
+    return { delay: clampInterval(delay), reason };
+}
+
+function scheduleNextPoll() {
+    clearTimeout(pollTimer);
+    const now = Date.now();
+    const { delay, reason } = nextPollDelay(now);
+    const wait = Math.max(0, lastPollAt + delay - now);
+    console.log(`${new Date().toISOString()} - Next eSpace poll in ${Math.round(wait / 1000)}s (${reason})`);
+    pollTimer = setTimeout(pollUpstream, wait);
+}
+
+function fetchUpstream() {
+    return new Promise((resolve, reject) => {
+        const req = https.get(API_URL, (apiRes) => {
+            let data = '';
+            apiRes.on('data', chunk => data += chunk);
+            apiRes.on('end', () => {
+                if (apiRes.statusCode !== 200) {
+                    reject(new Error(`eSpace responded with status ${apiRes.statusCode}`));
+                } else {
+                    resolve(data);
+                }
+            });
+            apiRes.on('error', reject);
+            apiRes.on('aborted', () => reject(new Error('eSpace response aborted')));
+            apiRes.on('close', () => {
+                if (!apiRes.complete) reject(new Error('eSpace connection closed mid-response'));
+            });
+        });
+        // A stalled connection must not leave the poll (and the schedule) pending forever
+        req.setTimeout(POLL.requestTimeout, () => {
+            req.destroy(new Error(`eSpace request timed out after ${POLL.requestTimeout / 1000}s`));
+        });
+        req.on('error', reject);
+    });
+}
+
+// Refresh the snapshot (shared if a poll is already running). Resolves to the
+// latest good snapshot, which is null only if eSpace has never responded.
+function pollUpstream() {
+    if (!inFlight) {
+        inFlight = fetchUpstream()
+            .then((body) => {
+                const boundaries = getEventBoundaries(JSON.parse(body));
+                const unchanged = snapshot !== null && snapshot.body === body;
+                snapshot = {
+                    body,
+                    boundaries,
+                    fetchedAt: Date.now(),
+                    unchangedPolls: unchanged ? snapshot.unchangedPolls + 1 : 0
+                };
+                failedPolls = 0;
+            })
+            .catch((err) => {
+                console.error('API fetch error:', err);
+                failedPolls++;
+            })
+            .then(() => {
+                inFlight = null;
+                lastPollAt = Date.now();
+                scheduleNextPoll();
+                return snapshot;
+            });
+    }
+    return inFlight;
+}
+
+// Note a display request; a display reconnecting after a quiet spell tightens the schedule
+function recordDisplayActivity() {
+    const now = Date.now();
+    const wasActive = isDisplayActive(now);
+    lastDisplayActivity = now;
+    if (!wasActive && !inFlight && lastPollAt) {
+        scheduleNextPoll();
+    }
+}
+
 const server = http.createServer((req, res) => {
     // Parse URL to separate pathname from query string
     const parsedUrl = new URL(req.url, `http://localhost:${PORT}`);
@@ -37,22 +241,23 @@ const server = http.createServer((req, res) => {
 
     console.log(`${new Date().toISOString()} - ${req.method} ${pathname}`);
 
-    // API proxy endpoint
+    // API endpoint - serves the latest eSpace snapshot
     if (pathname === '/api/events') {
-        https.get(API_URL, (apiRes) => {
-            let data = '';
-            apiRes.on('data', chunk => data += chunk);
-            apiRes.on('end', () => {
-                res.writeHead(200, {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                });
-                res.end(data);
+        recordDisplayActivity();
+        // With no snapshot yet, wait for the first poll - but during an outage
+        // leave recovery to the scheduled retry rather than polling per request
+        const ready = snapshot || failedPolls > 0 ? Promise.resolve(snapshot) : pollUpstream();
+        ready.then((current) => {
+            if (!current) {
+                res.writeHead(500, { 'Content-Type': 'application/json' });
+                res.end(JSON.stringify({ error: 'Failed to fetch events' }));
+                return;
+            }
+            res.writeHead(200, {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
             });
-        }).on('error', (err) => {
-            console.error('API fetch error:', err);
-            res.writeHead(500, { 'Content-Type': 'application/json' });
-            res.end(JSON.stringify({ error: 'Failed to fetch events' }));
+            res.end(current.body);
         });
         return;
     }
@@ -89,4 +294,5 @@ server.listen(PORT, () => {
 ║  Press Ctrl+C to stop                                  ║
 ╚════════════════════════════════════════════════════════╝
 `);
+    pollUpstream();
 });